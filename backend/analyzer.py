@@ -6,17 +6,34 @@ per-band intensity envelopes. The result is a 2D matrix (bands x frames)
 indicating where and how much compensation is needed in the instrumental.
 """
 
+import contextlib
+import io
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numba
 import numpy as np
-import librosa
-from scipy.ndimage import median_filter
+import soundfile as sf
+import scipy.fft
+import soxr
+from numba import njit, prange
+from scipy.signal import get_window, medfilt2d
 
 from .models import BandDefinition
 
-
 # Analysis constants
 ANALYSIS_SR = 22050
 N_FFT = 2048        # ~93ms window at 22050 Hz
 HOP_LENGTH = 512    # ~23ms hop → good temporal resolution
+STFT_BLOCK = 1024   # frames per rfft batch (bounds the windowed-frame buffer)
+
+
+# Directory for cached STFT power spectra (unset = no caching unless the
+# caller passes cache_dir explicitly, as the web server does per session)
+ANALYSIS_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR")
 
 
 def compute_band_edges(n_bands: int, sr: int) -> np.ndarray:
@@ -31,34 +48,334 @@ def compute_band_edges(n_bands: int, sr: int) -> np.ndarray:
     return np.geomspace(f_min, f_max, n_bands + 1)
 
 
-def map_bins_to_bands(
+def map_bins_to_band_index(
     n_fft: int, sr: int, band_edges: np.ndarray
-) -> list[np.ndarray]:
+) -> np.ndarray:
     """
-    For each band, return the array of STFT bin indices that fall within it.
-    Returns list of length n_bands, each element is an array of bin indices.
+    Return the band index of every STFT bin, shape (n_fft//2+1,), int32.
+    Bin k belongs to band b when band_edges[b] <= freq_k < band_edges[b+1];
+    bins outside all bands get -1.
     """
     freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
-    n_bands = len(band_edges) - 1
-    bin_groups = []
-    for b in range(n_bands):
-        mask = (freqs >= band_edges[b]) & (freqs < band_edges[b + 1])
-        bin_groups.append(np.where(mask)[0])
-    return bin_groups
+    bin_band = np.searchsorted(band_edges, freqs, side="right") - 1
+    bin_band[bin_band >= len(band_edges) - 1] = -1
+    return bin_band.astype(np.int32)
+
+
+def map_bins_to_band_bounds(
+    n_fft: int, sr: int, band_edges: np.ndarray
+) -> np.ndarray:
+    """
+    Return the n_bands + 1 bin boundaries of the bands: band b covers
+    STFT bins bounds[b] to bounds[b + 1] (exclusive).
+    """
+    # Bin frequencies are sorted, so each band is a contiguous run of bins
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    return np.searchsorted(freqs, band_edges, side="left")
+
+
+def build_band_matrix(bin_band: np.ndarray, n_bands: int) -> np.ndarray:
+    """
+    Build the (n_bands, n_bins) averaging matrix W with W[b, k] = 1/len(bins_b)
+    for every bin k in band b, so that W @ power gives per-band mean power
+    for all bands and frames in a single BLAS call. Empty bands get a zero row.
+
+    bin_band is the per-bin band index from map_bins_to_band_index.
+    """
+    bins = np.flatnonzero(bin_band >= 0)
+    bands = bin_band[bins]
+    counts = np.bincount(bands, minlength=n_bands)
+    W = np.zeros((n_bands, len(bin_band)), dtype=np.float32)
+    W[bands, bins] = 1.0 / counts[bands]
+    return W
 
 
 def build_band_definitions(band_edges: np.ndarray) -> list[BandDefinition]:
     """Create BandDefinition objects from band edges."""
-    n_bands = len(band_edges) - 1
-    defs = []
-    for b in range(n_bands):
-        defs.append(BandDefinition(
-            index=b,
-            low_hz=round(float(band_edges[b]), 1),
-            high_hz=round(float(band_edges[b + 1]), 1),
-            center_hz=round(float(np.sqrt(band_edges[b] * band_edges[b + 1])), 1),
-        ))
-    return defs
+    low = np.round(band_edges[:-1], 1).tolist()
+    high = np.round(band_edges[1:], 1).tolist()
+    center = np.round(np.sqrt(band_edges[:-1] * band_edges[1:]), 1).tolist()
+    return [
+        BandDefinition(index=b, low_hz=lo, high_hz=hi, center_hz=c)
+        for b, (lo, hi, c) in enumerate(zip(low, high, center))
+    ]
+
+
+def _load_mono(path: str) -> np.ndarray:
+    """
+    Load an audio file as mono float32 at the analysis sample rate.
+
+    Decodes with libsndfile and resamples with soxr (same "HQ" quality as
+    librosa's default), skipping librosa.load's dispatch and its slow
+    audioread fallback. Formats libsndfile can't open are decoded by ffmpeg.
+    """
+    try:
+        y, sr = sf.read(path, dtype="float32", always_2d=False)
+    except sf.LibsndfileError:
+        y, sr = _decode_ffmpeg(path)
+    if y.ndim == 2:
+        y = y.mean(axis=1)
+    if sr != ANALYSIS_SR:
+        y = soxr.resample(y, sr, ANALYSIS_SR, quality="HQ")
+    return y
+
+
+def _decode_ffmpeg(path: str) -> tuple[np.ndarray, int]:
+    """
+    Decode any ffmpeg-readable file to float32 through a pipe.
+
+    AU output carries rate and channel count in its header and can be
+    streamed, so downmix and resampling stay identical to the libsndfile path.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-f", "au", "-c:a", "pcm_f32be", "-"],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed for {path}: {result.stderr.decode(errors='replace')}")
+    return sf.read(io.BytesIO(result.stdout), dtype="float32", always_2d=False)
+
+
+def hann_window(n_fft: int) -> np.ndarray:
+    """Periodic Hann window of length n_fft (the STFT window), float32."""
+    return get_window("hann", n_fft, fftbins=True).astype(np.float32)
+
+
+def stft_frames(y: np.ndarray, n_fft: int, hop: int) -> np.ndarray:
+    """
+    STFT frames of y along its last axis, shape (..., n_frames, n_fft).
+
+    Same framing as librosa.stft's defaults: centered, with n_fft//2 zeros
+    padded at both ends. The padded signal is a single contiguous copy of y;
+    the frames are a strided view of it (overlapping frames aren't copied).
+    """
+    pad = [(0, 0)] * (y.ndim - 1) + [(n_fft // 2, n_fft // 2)]
+    padded = np.pad(y, pad)
+    return np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=-1)[..., ::hop, :]
+
+
+def rfft_blocks(frames: np.ndarray, window: np.ndarray, block_size: int, workers: int = -1):
+    """
+    scipy.fft.rfft of windowed frames (n_frames, n_fft), block_size frames at
+    a time. Yields (start, spectrum) with spectrum (n_block, n_fft//2+1).
+
+    One windowed-frame buffer is reused for every block (and as FFT scratch
+    space via overwrite_x), so memory stays bounded by block_size.
+    """
+    n_frames = frames.shape[0]
+    buf = np.empty((min(block_size, n_frames), frames.shape[1]), dtype=np.float32)
+    for start in range(0, n_frames, block_size):
+        block = frames[start:start + block_size]
+        windowed = np.multiply(block, window, out=buf[:len(block)])
+        yield start, scipy.fft.rfft(windowed, axis=-1, workers=workers, overwrite_x=True)
+
+
+_WINDOW = hann_window(N_FFT)
+
+
+def _stft_power(y: np.ndarray, workers: int = -1) -> np.ndarray:
+    """
+    float32 power spectrogram |S|^2, shape (N_FFT//2+1, n_frames).
+
+    Framed by stft_frames and transformed by rfft_blocks in batches of
+    STFT_BLOCK frames with `workers` FFT threads. Power is computed as
+    re^2 + im^2, skipping the sqrt/square round-trip of np.abs.
+    """
+    frames = stft_frames(y, N_FFT, HOP_LENGTH)
+    power = np.empty((N_FFT // 2 + 1, frames.shape[0]), dtype=np.float32)
+    for start, S in rfft_blocks(frames, _WINDOW, STFT_BLOCK, workers):
+        power[:, start:start + len(S)] = (np.square(S.real) + np.square(S.imag)).T
+    return power
+
+
+def _compute_power(
+    path: str, cache_dir: str | None = None, workers: int = -1
+) -> np.ndarray:
+    """
+    float32 power spectrogram of an audio file at the analysis sample rate.
+
+    The STFT depends on neither sensitivity nor band count, so when a cache
+    directory is given (or ANALYSIS_CACHE_DIR is set) it is stored as .npy,
+    keyed by file name, size and mtime plus the STFT parameters (so changing
+    ANALYSIS_SR, N_FFT or HOP_LENGTH never maps a stale spectrum), and
+    memory-mapped on later calls. Each cached spectrum takes about 10 MB per
+    minute of audio.
+    """
+    cache_dir = cache_dir or ANALYSIS_CACHE_DIR
+    cache_path = None
+    if cache_dir:
+        st = os.stat(path)
+        cache_path = os.path.join(
+            cache_dir,
+            f"power_{os.path.basename(path)}_{st.st_size}_{st.st_mtime_ns}"
+            f"_{ANALYSIS_SR}_{N_FFT}_{HOP_LENGTH}.npy",
+        )
+        if os.path.exists(cache_path):
+            # Copy-on-write: stays a plain writable array for the Numba kernels
+            # (read-only mappings would compile a separate specialization)
+            return np.load(cache_path, mmap_mode="c")
+
+    power = _stft_power(_load_mono(path), workers)
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a unique temp file then rename, so concurrent writers never
+        # share a file and a reader never sees a partial one
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, power)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return power
+
+
+def _band_rms(
+    power: np.ndarray, n_bands: int
+) -> tuple[np.ndarray, list[BandDefinition]]:
+    """
+    Aggregate a power spectrogram into per-band RMS, all bands at once.
+
+    Returns:
+        band_rms: np.ndarray (n_bands, n_frames), float32
+        band_defs: list of BandDefinition describing each band
+    """
+    band_edges = compute_band_edges(n_bands, ANALYSIS_SR)
+    bin_band = map_bins_to_band_index(N_FFT, ANALYSIS_SR, band_edges)
+    W = build_band_matrix(bin_band, n_bands)
+    return np.sqrt(W @ power), build_band_definitions(band_edges)
+
+
+def _median_smooth(matrix: np.ndarray, size: int) -> np.ndarray:
+    """
+    Median-filter every band along time with a single 2-D medfilt2d call.
+
+    medfilt2d zero-pads its input, so the time axis is padded symmetrically
+    first to keep the edge behaviour of scipy.ndimage.median_filter ('reflect').
+    """
+    half = size // 2
+    padded = np.pad(matrix, ((0, 0), (half, half)), mode="symmetric")
+    return medfilt2d(padded, kernel_size=(1, size))[:, half:padded.shape[1] - half]
+
+
+# Set by select_threading_layer() when the loaded Numba threading layer can't
+# take concurrent kernel launches; None (no serialization) otherwise
+_kernel_lock = None
+
+
+def kernel_lock():
+    """
+    Context manager held around every parallel kernel launch (here and in the
+    processor): a lock if select_threading_layer() found one necessary, else
+    a no-op.
+    """
+    return _kernel_lock if _kernel_lock is not None else contextlib.nullcontext()
+
+
+# The Numba kernels below keep their compiled code in __pycache__ (cache=True;
+# NUMBA_CACHE_DIR overrides the location), so only the first run after an
+# install or code change pays the JIT compile.
+@njit(parallel=True, fastmath=True, cache=True)
+def _band_gain_ratio(
+    power_mix: np.ndarray,
+    power_inst: np.ndarray,
+    n_frames: int,
+    band_bounds: np.ndarray,
+    max_gain: float,
+    range_db: float,
+    eps: float,
+) -> np.ndarray:
+    """
+    Per-band gain ratio mix_rms / inst_rms with the adaptive cap, fused.
+
+    Each band's RMS rows are accumulated directly from its contiguous bins of
+    the (n_bins, n_frames) power spectra, then turned into the ratio, the
+    band's median reference level over active frames and the clipped gain
+    without any full-size temporaries. Bands are independent, one per thread.
+
+    Only the first n_frames frames are read, so both spectra are passed whole
+    and every call keeps the argument types warmup_kernels compiles.
+
+    Returns gain_ratio_matrix: float32 (n_bands, n_frames), values 1.0 to max_gain
+    """
+    n_bands = len(band_bounds) - 1
+    out = np.empty((n_bands, n_frames), dtype=np.float32)
+    for b in prange(n_bands):
+        lo = band_bounds[b]
+        hi = band_bounds[b + 1]
+        if hi <= lo:
+            out[b, :] = 1.0  # empty band stays at unity
+            continue
+        mix_acc = np.zeros(n_frames)
+        inst_acc = np.zeros(n_frames)
+        for k in range(lo, hi):
+            for t in range(n_frames):
+                mix_acc[t] += power_mix[k, t]
+                inst_acc[t] += power_inst[k, t]
+
+        # mix_acc becomes the ratio, inst_acc the instrumental RMS
+        inv_count = 1.0 / (hi - lo)
+        inst_db = np.empty(n_frames)
+        n_active = 0
+        for t in range(n_frames):
+            inst_acc[t] = np.sqrt(inst_acc[t] * inv_count)
+            mix_acc[t] = np.sqrt(mix_acc[t] * inv_count) / (inst_acc[t] + eps)
+            inst_db[t] = 20.0 * np.log10(inst_acc[t] + eps)
+            if inst_acc[t] > 1e-6:  # exclude pure silence
+                n_active += 1
+
+        # Reference level: median of the non-silent frames (in dB)
+        ref_db = -80.0
+        if n_active > 0:
+            active = np.empty(n_active)
+            i = 0
+            for t in range(n_frames):
+                if inst_acc[t] > 1e-6:
+                    active[i] = inst_db[t]
+                    i += 1
+            ref_db = np.median(active)
+
+        # Adaptive ceiling: ramps from 1.0 (when inst is range_db below ref)
+        # to max_gain (when inst is at or above its band reference level).
+        # Never attenuate, never exceed the ceiling.
+        for t in range(n_frames):
+            ramp = min(max((inst_db[t] - (ref_db - range_db)) / range_db, 0.0), 1.0)
+            ceiling = 1.0 + (max_gain - 1.0) * ramp
+            out[b, t] = min(max(mix_acc[t], 1.0), ceiling)
+    return out
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _postprocess_vocal(intensity: np.ndarray, threshold: np.float32) -> np.ndarray:
+    """
+    Threshold, median-of-5 smoothing and clip to [0, 1] in a single sweep.
+
+    Equivalent to zeroing values below threshold, then median_filter(size=5)
+    per band ('reflect' edges), then np.clip — fused so the matrix is read
+    once. Each frame's 5-sample window is kept in a tiny insertion-sorted buffer.
+    """
+    n_bands, n_frames = intensity.shape
+    out = np.empty_like(intensity)
+    for b in prange(n_bands):
+        window = np.empty(5, dtype=intensity.dtype)
+        for i in range(n_frames):
+            for j in range(5):
+                k = i + j - 2
+                # Reflect at the edges: (d c b a | a b c d | d c b a)
+                while k < 0 or k >= n_frames:
+                    k = -k - 1 if k < 0 else 2 * n_frames - k - 1
+                v = intensity[b, k]
+                if v < threshold:
+                    v = 0.0
+                m = j
+                while m > 0 and window[m - 1] > v:
+                    window[m] = window[m - 1]
+                    m -= 1
+                window[m] = v
+            out[b, i] = min(max(window[2], 0.0), 1.0)
+    return out
 
 
 def analyze_vocal_multiband(
@@ -66,6 +383,7 @@ def analyze_vocal_multiband(
     sensitivity: int = 5,
     n_bands: int = 12,
     progress_callback=None,
+    cache_dir: str | None = None,
 ) -> tuple[np.ndarray, np.ndarray, list[BandDefinition]]:
     """
     Analyze vocal track into per-band intensity curves using STFT.
@@ -75,73 +393,50 @@ def analyze_vocal_multiband(
         sensitivity: 1-10, higher = more sensitive to quiet vocals
         n_bands: Number of frequency bands (6-24)
         progress_callback: Optional callback(percent: int)
+        cache_dir: Optional directory for the cached STFT power spectrum
 
     Returns:
-        intensity_matrix: np.ndarray of shape (n_bands, n_frames), values 0-1
+        intensity_matrix: float32 np.ndarray of shape (n_bands, n_frames), values 0-1
         frame_times: np.ndarray of frame timestamps in seconds
         band_defs: list of BandDefinition describing each band
     """
     if progress_callback:
         progress_callback(5)
 
-    # Load vocal track (mono, resampled to analysis rate)
-    vocal, sr = librosa.load(vocal_path, sr=ANALYSIS_SR, mono=True)
-
-    if progress_callback:
-        progress_callback(15)
-
-    # Compute STFT
-    S = librosa.stft(vocal, n_fft=N_FFT, hop_length=HOP_LENGTH)
-    mag = np.abs(S)  # shape: (n_fft//2+1, n_frames)
+    # STFT power spectrum of the vocal track (mono, analysis rate), cached
+    power = _compute_power(vocal_path, cache_dir)  # shape: (n_fft//2+1, n_frames)
 
-    frame_times = librosa.frames_to_time(
-        np.arange(mag.shape[1]), sr=sr, hop_length=HOP_LENGTH
-    )
+    frame_times = np.arange(power.shape[1]) * HOP_LENGTH / ANALYSIS_SR
 
     if progress_callback:
         progress_callback(25)
 
-    # Band setup
-    band_edges = compute_band_edges(n_bands, sr)
-    bin_groups = map_bins_to_bands(N_FFT, sr, band_edges)
-    band_defs = build_band_definitions(band_edges)
-
-    # Per-band RMS energy
-    n_frames = mag.shape[1]
-    intensity_matrix = np.zeros((n_bands, n_frames), dtype=np.float64)
+    # Per-band RMS energy, all bands at once: (n_bands, n_frames)
+    band_rms, band_defs = _band_rms(power, n_bands)
+    del power
 
-    for b, bins in enumerate(bin_groups):
-        if len(bins) == 0:
-            continue
-
-        # RMS across bins in this band, per frame
-        band_mag = mag[bins, :]  # shape: (n_bins_in_band, n_frames)
-        band_rms = np.sqrt(np.mean(band_mag ** 2, axis=0))  # shape: (n_frames,)
-
-        # Normalize this band independently to 0-1
-        band_max = band_rms.max()
-        if band_max > 0:
-            intensity_matrix[b, :] = band_rms / band_max
+    # Normalize each band independently to 0-1 (silent bands stay at 0)
+    band_max = band_rms.max(axis=1, keepdims=True)
+    intensity_matrix = np.divide(
+        band_rms, band_max, out=np.zeros_like(band_rms), where=band_max > 0
+    )
 
-        if progress_callback:
-            progress_callback(int(25 + 50 * (b + 1) / n_bands))
+    if progress_callback:
+        progress_callback(75)
 
     # Apply sensitivity threshold per band
     # sensitivity 1 → 0.70 (only very loud vocals)
     # sensitivity 5 → 0.42 (balanced, ≈ old max)
     # sensitivity 10 → 0.07 (detects everything)
     threshold = 0.70 - (sensitivity - 1) * 0.07
-    intensity_matrix[intensity_matrix < threshold] = 0.0
-
-    if progress_callback:
-        progress_callback(80)
-
-    # Light temporal smoothing per band (median filter removes single-frame spikes)
-    for b in range(n_bands):
-        intensity_matrix[b, :] = median_filter(intensity_matrix[b, :], size=5)
 
-    # Clip to valid range
-    intensity_matrix = np.clip(intensity_matrix, 0.0, 1.0)
+    # Threshold, light temporal smoothing per band (median filter removes
+    # single-frame spikes) and clip to valid range, fused in one pass.
+    # float32 throughout: the STFT is complex64 and banding stays single precision.
+    with kernel_lock():
+        intensity_matrix = _postprocess_vocal(
+            intensity_matrix.astype(np.float32, copy=False), np.float32(threshold)
+        )
 
     if progress_callback:
         progress_callback(90)
@@ -154,6 +449,7 @@ def analyze_mix_reference(
     instrumental_path: str,
     n_bands: int = 24,
     progress_callback=None,
+    cache_dir: str | None = None,
 ) -> tuple[np.ndarray, np.ndarray, list[BandDefinition]]:
     """
     Analyze mix vs instrumental to compute per-band gain ratios.
@@ -168,9 +464,10 @@ def analyze_mix_reference(
         instrumental_path: Path to the devocalized instrumental
         n_bands: Number of frequency bands (6-32)
         progress_callback: Optional callback(percent: int)
+        cache_dir: Optional directory for the cached STFT power spectra
 
     Returns:
-        gain_ratio_matrix: np.ndarray (n_bands, n_frames), values 1.0 to MAX_GAIN
+        gain_ratio_matrix: float32 np.ndarray (n_bands, n_frames), values 1.0 to MAX_GAIN
         frame_times: np.ndarray of frame timestamps in seconds
         band_defs: list of BandDefinition describing each band
     """
@@ -179,47 +476,19 @@ def analyze_mix_reference(
     if progress_callback:
         progress_callback(5)
 
-    # Load both tracks (mono, analysis sample rate)
-    mix, sr = librosa.load(mix_path, sr=ANALYSIS_SR, mono=True)
-
-    if progress_callback:
-        progress_callback(10)
-
-    inst, _ = librosa.load(instrumental_path, sr=ANALYSIS_SR, mono=True)
-
-    if progress_callback:
-        progress_callback(15)
-
-    # Align lengths (pad shorter with zeros)
-    if len(mix) > len(inst):
-        inst = np.pad(inst, (0, len(mix) - len(inst)))
-    elif len(inst) > len(mix):
-        mix = np.pad(mix, (0, len(inst) - len(mix)))
-
-    # STFT of both
-    S_mix = librosa.stft(mix, n_fft=N_FFT, hop_length=HOP_LENGTH)
-    mag_mix = np.abs(S_mix)
-    del S_mix
-
-    if progress_callback:
-        progress_callback(25)
-
-    S_inst = librosa.stft(inst, n_fft=N_FFT, hop_length=HOP_LENGTH)
-    mag_inst = np.abs(S_inst)
-    del S_inst
+    # Both tracks are independent until banding: decode and STFT them
+    # concurrently (libsndfile/soxr and the FFT kernels release the GIL).
+    # Both power spectra are cached, so reanalysis skips straight to banding.
+    # The cores are split between the two FFTs rather than oversubscribed.
+    workers = max(1, (os.cpu_count() or 1) // 2)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        f_mix = pool.submit(_compute_power, mix_path, cache_dir, workers)
+        f_inst = pool.submit(_compute_power, instrumental_path, cache_dir, workers)
+        power_mix, power_inst = f_mix.result(), f_inst.result()
 
     if progress_callback:
         progress_callback(35)
 
-    frame_times = librosa.frames_to_time(
-        np.arange(mag_mix.shape[1]), sr=sr, hop_length=HOP_LENGTH
-    )
-
-    # Band setup
-    band_edges = compute_band_edges(n_bands, sr)
-    bin_groups = map_bins_to_bands(N_FFT, sr, band_edges)
-    band_defs = build_band_definitions(band_edges)
-
     # Per-band gain ratio with adaptive gain cap.
     # Each band uses its own median instrumental energy as reference.
     # Where the instrumental is close to its typical level, full boost is allowed.
@@ -227,54 +496,30 @@ def analyze_mix_reference(
     # vocal residues or noise.
     ADAPTIVE_RANGE_DB = 40.0  # dB range over which gain ramps from 1.0 to MAX_GAIN
 
-    n_frames = mag_mix.shape[1]
-    gain_ratio_matrix = np.ones((n_bands, n_frames), dtype=np.float32)
-
     eps = 1e-10  # avoid division by zero
 
-    for b, bins in enumerate(bin_groups):
-        if len(bins) == 0:
-            continue
+    # Align lengths: keep only the frames both tracks cover (beyond that the
+    # processor falls back to unity gain)
+    n_frames = min(power_mix.shape[1], power_inst.shape[1])
 
-        # RMS across bins in this band, per frame
-        mix_rms = np.sqrt(np.mean(mag_mix[bins, :] ** 2, axis=0))
-        inst_rms = np.sqrt(np.mean(mag_inst[bins, :] ** 2, axis=0))
-
-        # Gain ratio: how much to boost instrumental to match mix
-        ratio = mix_rms / (inst_rms + eps)
-
-        # --- Adaptive gain cap per band ---
-        # Compute this band's reference level: median of non-silent frames (in dB)
-        inst_db = 20.0 * np.log10(inst_rms + eps)
-        active_mask = inst_rms > 1e-6  # exclude pure silence
-        if np.any(active_mask):
-            band_ref_db = float(np.median(inst_db[active_mask]))
-        else:
-            band_ref_db = -80.0
-
-        # Adaptive ceiling: ramps from 1.0 (when inst is ADAPTIVE_RANGE_DB below ref)
-        # to MAX_GAIN (when inst is at or above its band reference level)
-        gain_ceiling = 1.0 + (MAX_GAIN - 1.0) * np.clip(
-            (inst_db - (band_ref_db - ADAPTIVE_RANGE_DB)) / ADAPTIVE_RANGE_DB,
-            0.0, 1.0,
-        )
-
-        # Apply both caps: never attenuate, never exceed adaptive ceiling
-        ratio = np.clip(ratio, 1.0, gain_ceiling)
-
-        gain_ratio_matrix[b, :] = ratio
+    band_edges = compute_band_edges(n_bands, ANALYSIS_SR)
+    band_bounds = map_bins_to_band_bounds(N_FFT, ANALYSIS_SR, band_edges)
+    band_defs = build_band_definitions(band_edges)
 
-        if progress_callback:
-            progress_callback(int(35 + 45 * (b + 1) / n_bands))
+    frame_times = np.arange(n_frames) * HOP_LENGTH / ANALYSIS_SR
 
-    del mag_mix, mag_inst
+    # Band RMS, gain ratio, median reference and adaptive cap in one pass
+    with kernel_lock():
+        gain_ratio_matrix = _band_gain_ratio(
+            power_mix, power_inst, n_frames, band_bounds, MAX_GAIN, ADAPTIVE_RANGE_DB, eps,
+        )
+    del power_mix, power_inst
 
     if progress_callback:
         progress_callback(85)
 
     # Light temporal smoothing (median filter removes single-frame spikes)
-    for b in range(n_bands):
-        gain_ratio_matrix[b, :] = median_filter(gain_ratio_matrix[b, :], size=3)
+    gain_ratio_matrix = _median_smooth(gain_ratio_matrix, size=3)
 
     if progress_callback:
         progress_callback(90)
@@ -287,16 +532,19 @@ def downsample_heatmap(
     frame_times: np.ndarray,
     target_columns: int = 800,
     mode: str = "vocal",
-) -> tuple[list[list[float]], list[float]]:
+) -> tuple[np.ndarray, np.ndarray]:
     """
     Downsample the intensity matrix for frontend visualization.
 
     For mode="mix", the matrix contains gain ratios (1.0 to MAX_GAIN).
     These are normalized to 0-1 for display: (ratio - 1) / (MAX_GAIN - 1).
 
+    Arrays are returned as-is for orjson to serialize straight from the
+    buffer.
+
     Returns:
-        heatmap: list of lists [n_bands][target_columns], values 0-1
-        times: list of timestamps for each column
+        heatmap: float32 array [n_bands][n_columns], values 0-1, 3 decimals
+        times: array of timestamps for each column, 4 decimals
     """
     MAX_GAIN = 10.0
     n_bands, n_frames = intensity_matrix.shape
@@ -308,22 +556,57 @@ def downsample_heatmap(
         vis_matrix = intensity_matrix
 
     if n_frames <= target_columns:
-        return (
-            vis_matrix.round(3).tolist(),
-            frame_times.round(4).tolist(),
-        )
+        # Short track: one column per frame (copy, since it's rounded in place)
+        heatmap = np.array(vis_matrix, dtype=np.float32)
+        times = frame_times
+    elif n_frames % target_columns == 0:
+        # Downsample by taking max in each window (preserves peaks)
+        bucket = n_frames // target_columns
+        heatmap = vis_matrix.reshape(n_bands, target_columns, bucket).max(axis=2)
+        times = frame_times[::bucket]
+    else:
+        # Window i spans [start_i, start_{i+1}); the last one runs to the end
+        step = n_frames / target_columns
+        starts = (np.arange(target_columns) * step).astype(np.int64)
+        heatmap = np.maximum.reduceat(vis_matrix, starts, axis=1)
+        times = frame_times[starts]
+
+    heatmap = np.ascontiguousarray(heatmap, dtype=np.float32)
+    np.round(heatmap, 3, out=heatmap)
+    times = np.round(times, 4)
+    return heatmap, times
 
-    # Downsample by taking max in each window (preserves peaks)
-    step = n_frames / target_columns
-    heatmap = np.zeros((n_bands, target_columns), dtype=np.float64)
-    times = np.zeros(target_columns)
 
-    for i in range(target_columns):
-        start_idx = int(i * step)
-        end_idx = min(int((i + 1) * step), n_frames)
-        if end_idx <= start_idx:
-            end_idx = start_idx + 1
-        heatmap[:, i] = vis_matrix[:, start_idx:end_idx].max(axis=1)
-        times[i] = frame_times[start_idx]
+def warmup_kernels() -> None:
+    """
+    Compile (or load from the on-disk cache) the analysis Numba kernels with
+    the argument types the analyzers pass, on tiny inputs, so the first
+    request doesn't pay the JIT cost.
+    """
+    band_bounds = map_bins_to_band_bounds(N_FFT, ANALYSIS_SR, compute_band_edges(6, ANALYSIS_SR))
+    power = np.zeros((N_FFT // 2 + 1, 8), dtype=np.float32)
+    _band_gain_ratio(power, power, 8, band_bounds, 10.0, 40.0, 1e-10)
+    _postprocess_vocal(np.zeros((6, 8), dtype=np.float32), np.float32(0.5))
 
-    return heatmap.round(3).tolist(), times.round(4).tolist()
+
+def select_threading_layer() -> str:
+    """
+    Set up Numba threading for a process that launches kernels from several
+    threads at once (the web server); call it before any kernel runs.
+    Library and CLI use keep Numba's own defaults.
+
+    Prefers a threadsafe layer, OpenMP before TBB (TBB can hang interpreter
+    exit once kernels have run on executor threads), unless
+    NUMBA_THREADING_LAYER(_PRIORITY) says otherwise. If only workqueue loads,
+    which aborts on concurrent launches, kernel_lock() serializes them.
+    Returns the loaded layer's name.
+    """
+    global _kernel_lock
+    if not {"NUMBA_THREADING_LAYER", "NUMBA_THREADING_LAYER_PRIORITY"} & os.environ.keys():
+        numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+    # The layer is only loaded by the first parallel launch
+    _postprocess_vocal(np.zeros((6, 8), dtype=np.float32), np.float32(0.5))
+    layer = numba.threading_layer()
+    if layer == "workqueue":
+        _kernel_lock = threading.Lock()
+    return layer
@@ -1,16 +1,21 @@
 import asyncio
 import os
+import shutil
 import uuid
 import json
+from collections import OrderedDict
 from pathlib import Path
 
 import numpy as np
+import orjson
 from fastapi import FastAPI, UploadFile, File, Form, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from .analyzer import analyze_vocal_multiband, analyze_mix_reference, downsample_heatmap, ANALYSIS_SR, HOP_LENGTH
+from .analyzer import select_threading_layer, warmup_kernels as warmup_analysis_kernels
 from .processor import process_audio_async
+from .processor import warmup_kernels as warmup_processing_kernels
 from .models import AnalysisResponse, ProcessRequest, ProcessResponse, BandDefinition
 from .utils import get_session_dir, get_audio_duration, get_waveform_peaks, SUPPORTED_EXTENSIONS, check_dependencies
 
@@ -19,7 +24,20 @@ app = FastAPI(title="Enhance Devocalized", version="2.0.0")
 
 @app.on_event("startup")
 async def startup_event():
+    global _drain_task
     check_dependencies()
+    # Requests launch Numba kernels from several threads at once
+    await asyncio.to_thread(select_threading_layer)
+    # JIT-compile (or load cached) Numba kernels before the first request
+    await asyncio.to_thread(warmup_analysis_kernels)
+    await asyncio.to_thread(warmup_processing_kernels)
+    _drain_task = asyncio.create_task(_drain_progress())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _drain_task is not None:
+        _drain_task.cancel()
 
 # Serve frontend static files
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
@@ -28,6 +46,23 @@ app.mount("/static", StaticFiles(directory=str(FRONTEND_DIR)), name="static")
 # Active WebSocket connections per session
 _ws_connections: dict[str, list[WebSocket]] = {}
 
+# Latest processing percent per session, set from the worker thread and
+# coalesced into one WebSocket message per session every PROGRESS_INTERVAL
+_pending_progress: dict[str, int] = {}
+_drain_task: asyncio.Task | None = None
+PROGRESS_INTERVAL = 0.1  # seconds
+
+# Uploaded file paths per (session_dir, prefix), filled at upload time so
+# _find_file doesn't rescan the session directory on every request. An LRU of
+# SESSION_FILE_CACHE_SIZE entries (two per session); entries whose file is
+# gone are dropped on lookup.
+_session_file_cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+SESSION_FILE_CACHE_SIZE = 512
+
+# Analysis matrices are stored quantized (float16 for vocal intensity, uint8
+# for the mix gain ratio). Set ANALYSIS_QUANTIZE=0 to keep them float32.
+ANALYSIS_QUANTIZE = os.environ.get("ANALYSIS_QUANTIZE", "1") != "0"
+
 
 @app.get("/")
 async def root():
@@ -53,67 +88,79 @@ async def analyze(
     if vocal_ext not in SUPPORTED_EXTENSIONS or inst_ext not in SUPPORTED_EXTENSIONS:
         raise HTTPException(400, f"Unsupported format. Supported: {', '.join(SUPPORTED_EXTENSIONS)}")
 
-    # Read file contents before entering the generator
-    vocal_bytes = await vocal.read()
-    inst_bytes = await instrumental.read()
+    # Step 1: Save files. Uploads are closed once this endpoint returns, so
+    # stream them to disk (in worker threads) before the generator starts.
+    session_id = uuid.uuid4().hex[:12]
+    session_dir = get_session_dir(session_id)
+    # Always save as "vocal" prefix for compatibility (it's the reference track)
+    vocal_path = os.path.join(session_dir, f"vocal{vocal_ext}")
+    inst_path = os.path.join(session_dir, f"instrumental{inst_ext}")
+    await asyncio.gather(
+        asyncio.to_thread(_save_upload, vocal, vocal_path),
+        asyncio.to_thread(_save_upload, instrumental, inst_path),
+    )
+    _cache_session_file((session_dir, "vocal"), vocal_path)
+    _cache_session_file((session_dir, "instrumental"), inst_path)
+    # Save mode for reanalyze/process
+    with open(os.path.join(session_dir, "mode.txt"), "w") as f:
+        f.write(mode)
 
     async def event_stream():
         def sse(event_type: str, data: dict) -> str:
-            return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
-
-        # Step 1: Save files
-        yield sse("progress", {"step": "Salvataggio file...", "percent": 5})
-        session_id = uuid.uuid4().hex[:12]
-        session_dir = get_session_dir(session_id)
-        # Always save as "vocal" prefix for compatibility (it's the reference track)
-        vocal_path = os.path.join(session_dir, f"vocal{vocal_ext}")
-        inst_path = os.path.join(session_dir, f"instrumental{inst_ext}")
-        with open(vocal_path, "wb") as f:
-            f.write(vocal_bytes)
-        with open(inst_path, "wb") as f:
-            f.write(inst_bytes)
-        # Save mode for reanalyze/process
-        with open(os.path.join(session_dir, "mode.txt"), "w") as f:
-            f.write(mode)
+            body = orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+            return f"event: {event_type}\ndata: {body}\n\n"
+
         yield sse("progress", {"step": "File salvati", "percent": 10})
         await asyncio.sleep(0)
 
-        # Step 2: Analysis (depends on mode)
-        if mode == "mix":
-            yield sse("progress", {"step": "Analisi confronto mix vs strumentale (STFT)...", "percent": 15})
-            await asyncio.sleep(0)
-            intensity_matrix, frame_times, band_defs = await asyncio.to_thread(
-                analyze_mix_reference,
-                vocal_path,
-                inst_path,
-                band_count,
-            )
-            yield sse("progress", {"step": "Analisi completata", "percent": 65})
-        else:
-            yield sse("progress", {"step": "Analisi multiband vocale (STFT)...", "percent": 15})
-            await asyncio.sleep(0)
-            intensity_matrix, frame_times, band_defs = await asyncio.to_thread(
-                analyze_vocal_multiband,
-                vocal_path,
-                sensitivity,
-                band_count,
-            )
-            yield sse("progress", {"step": "Analisi vocale completata", "percent": 65})
-        await asyncio.sleep(0)
+        # Waveform peaks don't depend on the analysis: start them now so the
+        # decodes overlap with the STFT work instead of following it
+        vocal_peaks_task = asyncio.create_task(
+            asyncio.to_thread(get_waveform_peaks, vocal_path, 800)
+        )
+        inst_peaks_task = asyncio.create_task(
+            asyncio.to_thread(get_waveform_peaks, inst_path, 800)
+        )
 
-        # Save analysis results for later processing
-        np.save(os.path.join(session_dir, "intensity_matrix.npy"), intensity_matrix)
-        np.save(os.path.join(session_dir, "frame_times.npy"), frame_times)
-        _save_band_defs(os.path.join(session_dir, "band_defs.json"), band_defs)
+        try:
+            # Step 2: Analysis (depends on mode)
+            if mode == "mix":
+                yield sse("progress", {"step": "Analisi confronto mix vs strumentale (STFT)...", "percent": 15})
+                await asyncio.sleep(0)
+                intensity_matrix, frame_times, band_defs = await asyncio.to_thread(
+                    analyze_mix_reference,
+                    vocal_path,
+                    inst_path,
+                    band_count,
+                    cache_dir=session_dir,
+                )
+                yield sse("progress", {"step": "Analisi completata", "percent": 65})
+            else:
+                yield sse("progress", {"step": "Analisi multiband vocale (STFT)...", "percent": 15})
+                await asyncio.sleep(0)
+                intensity_matrix, frame_times, band_defs = await asyncio.to_thread(
+                    analyze_vocal_multiband,
+                    vocal_path,
+                    sensitivity,
+                    band_count,
+                    cache_dir=session_dir,
+                )
+                yield sse("progress", {"step": "Analisi vocale completata", "percent": 65})
+            await asyncio.sleep(0)
 
-        # Step 3: Waveform peaks
-        yield sse("progress", {"step": "Calcolo waveform riferimento...", "percent": 70})
-        await asyncio.sleep(0)
-        vocal_peaks = await asyncio.to_thread(get_waveform_peaks, vocal_path, 800)
+            # Save analysis results for later processing
+            _save_analysis(session_dir, intensity_matrix, frame_times, band_defs, mode)
 
-        yield sse("progress", {"step": "Calcolo waveform strumentale...", "percent": 80})
-        await asyncio.sleep(0)
-        inst_peaks = await asyncio.to_thread(get_waveform_peaks, inst_path, 800)
+            # Step 3: Waveform peaks (started alongside the analysis)
+            yield sse("progress", {"step": "Calcolo waveform...", "percent": 70})
+            await asyncio.sleep(0)
+            vocal_peaks, inst_peaks = await asyncio.gather(vocal_peaks_task, inst_peaks_task)
+        finally:
+            # If the analysis failed (or the client went away), do not leave
+            # the peaks tasks running unobserved
+            for task in (vocal_peaks_task, inst_peaks_task):
+                task.cancel()
+            await asyncio.gather(vocal_peaks_task, inst_peaks_task, return_exceptions=True)
 
         yield sse("progress", {"step": "Preparazione risultato...", "percent": 90})
         await asyncio.sleep(0)
@@ -123,7 +170,8 @@ async def analyze(
         duration = get_audio_duration(inst_path)
         hop_seconds = float(HOP_LENGTH) / ANALYSIS_SR
 
-        result = AnalysisResponse(
+        # model_construct: the heatmap arrays stay ndarrays (see _analysis_payload)
+        result = AnalysisResponse.model_construct(
             session_id=session_id,
             duration=duration,
             sample_rate=ANALYSIS_SR,
@@ -138,7 +186,7 @@ async def analyze(
             mode=mode,
         )
         yield sse("progress", {"step": "Completato!", "percent": 100})
-        yield sse("result", result.model_dump())
+        yield sse("result", _analysis_payload(result))
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
@@ -162,23 +210,24 @@ async def reanalyze(
     with open(os.path.join(session_dir, "mode.txt"), "w") as f:
         f.write(mode)
 
+    # The STFT power spectra cached at upload time make this banding-only
     if mode == "mix":
         intensity_matrix, frame_times, band_defs = analyze_mix_reference(
             vocal_path,
             inst_path,
             n_bands=band_count,
+            cache_dir=session_dir,
         )
     else:
         intensity_matrix, frame_times, band_defs = analyze_vocal_multiband(
             vocal_path,
             sensitivity=sensitivity,
             n_bands=band_count,
+            cache_dir=session_dir,
         )
 
     # Save updated analysis
-    np.save(os.path.join(session_dir, "intensity_matrix.npy"), intensity_matrix)
-    np.save(os.path.join(session_dir, "frame_times.npy"), frame_times)
-    _save_band_defs(os.path.join(session_dir, "band_defs.json"), band_defs)
+    _save_analysis(session_dir, intensity_matrix, frame_times, band_defs, mode)
 
     heatmap, heatmap_times = downsample_heatmap(intensity_matrix, frame_times, mode=mode)
     vocal_peaks = get_waveform_peaks(vocal_path, num_peaks=800)
@@ -186,7 +235,7 @@ async def reanalyze(
     duration = get_audio_duration(inst_path)
     hop_seconds = float(HOP_LENGTH) / ANALYSIS_SR
 
-    return AnalysisResponse(
+    result = AnalysisResponse.model_construct(
         session_id=session_id,
         duration=duration,
         sample_rate=ANALYSIS_SR,
@@ -200,6 +249,7 @@ async def reanalyze(
         instrumental_peaks=inst_peaks,
         mode=mode,
     )
+    return ORJSONResponse(_analysis_payload(result))
 
 
 @app.post("/api/process", response_model=ProcessResponse)
@@ -222,38 +272,34 @@ async def process(req: ProcessRequest):
         mode = req.mode
 
     # Load pre-computed analysis results
-    matrix_path = os.path.join(session_dir, "intensity_matrix.npy")
-    times_path = os.path.join(session_dir, "frame_times.npy")
-    bands_path = os.path.join(session_dir, "band_defs.json")
+    analysis = _load_analysis(session_dir)
 
-    if not os.path.exists(matrix_path):
+    if analysis is None:
         # Need to analyze first (e.g. band_count changed)
         vocal_path = _find_file(session_dir, "vocal")
         if not vocal_path:
             raise HTTPException(404, "Reference file not found. Please re-analyze.")
         if mode == "mix":
             intensity_matrix, frame_times, band_defs = analyze_mix_reference(
-                vocal_path, inst_path, n_bands=req.band_count,
+                vocal_path, inst_path, n_bands=req.band_count, cache_dir=session_dir,
             )
         else:
             intensity_matrix, frame_times, band_defs = analyze_vocal_multiband(
                 vocal_path, sensitivity=req.sensitivity, n_bands=req.band_count,
+                cache_dir=session_dir,
             )
-        np.save(matrix_path, intensity_matrix)
-        np.save(times_path, frame_times)
-        _save_band_defs(bands_path, band_defs)
+        _save_analysis(session_dir, intensity_matrix, frame_times, band_defs, mode)
     else:
-        intensity_matrix = np.load(matrix_path)
-        frame_times = np.load(times_path)
-        band_defs = _load_band_defs(bands_path)
+        intensity_matrix, frame_times, band_defs = analysis
 
     # Output file
     output_name = f"enhanced_{req.session_id}{inst_ext}"
     output_path = os.path.join(session_dir, output_name)
 
-    # Progress callback via WebSocket
-    async def on_progress(pct: int):
-        await _broadcast_progress(req.session_id, pct)
+    # Progress callback via WebSocket (called from the worker thread; only the
+    # latest value is kept and sent by _drain_progress)
+    def on_progress(pct: int):
+        _pending_progress[req.session_id] = pct
 
     try:
         await process_audio_async(
@@ -338,23 +384,128 @@ async def ws_progress(websocket: WebSocket, session_id: str):
 async def _broadcast_progress(session_id: str, percent: int):
     """Send progress update to all WebSocket connections for a session."""
     conns = _ws_connections.get(session_id, [])
+    if not conns:
+        return
+    message = orjson.dumps({"type": "progress", "percent": percent}).decode()
     for ws in list(conns):
         try:
-            await ws.send_json({"type": "progress", "percent": percent})
+            await ws.send_text(message)
         except Exception:
             pass
 
 
+async def _drain_progress():
+    """Broadcast the most recent pending percent of each session, at 10 Hz."""
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        for session_id in list(_pending_progress):
+            percent = _pending_progress.pop(session_id, None)
+            if percent is not None:
+                await _broadcast_progress(session_id, percent)
+
+
+def _save_upload(upload: UploadFile, dest: str) -> None:
+    """Stream an uploaded file to disk in 1 MiB chunks."""
+    with open(dest, "wb") as f:
+        shutil.copyfileobj(upload.file, f, length=1 << 20)
+
+
 def _find_file(session_dir: str, prefix: str) -> str | None:
     """Find a file in session_dir starting with the given prefix."""
+    key = (session_dir, prefix)
+    cached = _session_file_cache.pop(key, None)
+    if cached and os.path.isfile(cached):
+        _session_file_cache[key] = cached  # most recently used
+        return cached
     if not os.path.isdir(session_dir):
         return None
-    for f in os.listdir(session_dir):
-        if f.startswith(prefix):
-            return os.path.join(session_dir, f)
+    with os.scandir(session_dir) as it:
+        for entry in it:
+            if entry.name.startswith(prefix) and entry.is_file():
+                _cache_session_file(key, entry.path)
+                return entry.path
     return None
 
 
+def _cache_session_file(key: tuple[str, str], path: str) -> None:
+    """Remember a session file path, evicting the least recently used."""
+    _session_file_cache[key] = path
+    _session_file_cache.move_to_end(key)
+    while len(_session_file_cache) > SESSION_FILE_CACHE_SIZE:
+        _session_file_cache.popitem(last=False)
+
+
+def _analysis_payload(result: AnalysisResponse) -> dict:
+    """
+    Dump an AnalysisResponse for orjson. The heatmap ndarrays are passed
+    through untouched so orjson serializes them straight from the buffer
+    instead of going through Python lists.
+    """
+    arrays = {"intensity_heatmap", "heatmap_times"}
+    payload = result.model_dump(exclude=arrays)
+    for name in arrays:
+        payload[name] = getattr(result, name)
+    return payload
+
+
+def _save_analysis(
+    session_dir: str,
+    intensity_matrix: np.ndarray,
+    frame_times: np.ndarray,
+    band_defs: list[BandDefinition],
+    mode: str,
+) -> None:
+    """Save analysis results as a compressed .npz plus band definitions JSON.
+
+    Vocal intensity (0-1) is stored as float16. The mix gain ratio (>= 1) is
+    stored as uint8 codes with a linear scale/offset, so the stored value is
+    offset + code * scale.
+    """
+    scale, offset = 1.0, 0.0
+    if not ANALYSIS_QUANTIZE:
+        matrix = np.asarray(intensity_matrix, dtype=np.float32)
+    elif mode == "mix":
+        offset = 1.0
+        span = float(intensity_matrix.max()) - offset if intensity_matrix.size else 0.0
+        scale = span / 255.0 if span > 0 else 1.0
+        codes = np.rint((intensity_matrix - offset) / scale)
+        matrix = np.clip(codes, 0, 255).astype(np.uint8)
+    else:
+        matrix = intensity_matrix.astype(np.float16)
+
+    np.savez_compressed(
+        os.path.join(session_dir, "analysis.npz"),
+        matrix=matrix,
+        scale=np.float32(scale),
+        offset=np.float32(offset),
+        frame_times=frame_times,
+    )
+    _save_band_defs(os.path.join(session_dir, "band_defs.json"), band_defs)
+
+
+def _load_analysis(
+    session_dir: str,
+) -> tuple[np.ndarray, np.ndarray, list[BandDefinition]] | None:
+    """Load analysis results saved by _save_analysis, upcast to float32.
+
+    Returns None if the session has no saved analysis.
+    """
+    path = os.path.join(session_dir, "analysis.npz")
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        matrix = data["matrix"].astype(np.float32)
+        scale = float(data["scale"])
+        offset = float(data["offset"])
+        frame_times = data["frame_times"]
+    if scale != 1.0:
+        matrix *= scale
+    if offset != 0.0:
+        matrix += offset
+    band_defs = _load_band_defs(os.path.join(session_dir, "band_defs.json"))
+    return matrix, frame_times, band_defs
+
+
 def _save_band_defs(path: str, band_defs: list[BandDefinition]) -> None:
     """Save band definitions to JSON."""
     with open(path, "w") as f:
@@ -6,7 +6,7 @@ the vocal intensity analysis. Each band is independently boosted
 in proportion to how much vocal energy was detected in that band.
 
 Processing is done entirely in the STFT domain:
-- Compute STFT of instrumental (per channel)
+- Compute STFT of instrumental (channels in parallel)
 - Map STFT bins to the same bands used in analysis
 - Apply per-bin gain modulated by the band's vocal intensity
 - ISTFT back to time domain (perfect reconstruction via overlap-add)
@@ -16,14 +16,25 @@ No segmentation, no crossfades, no limiter — just clean spectral gain.
 
 import asyncio
 import os
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import librosa
+import scipy.fft
 import soundfile as sf
-from scipy.interpolate import interp1d
-
-from .analyzer import compute_band_edges, map_bins_to_bands
+from numba import njit, prange
+
+from .analyzer import (
+    build_band_definitions,
+    compute_band_edges,
+    hann_window,
+    kernel_lock,
+    map_bins_to_band_bounds,
+    rfft_blocks,
+    stft_frames,
+)
 from .models import BandDefinition
 from .utils import get_output_codec_args
 
@@ -44,25 +55,29 @@ def _interpolate_intensity_to_stft_frames(
 
     For mode="vocal": values are 0-1 intensity, fill_value=0.0
     For mode="mix": values are gain ratios (1.0 to MAX_GAIN), fill_value=1.0
+
+    Returns float32 (n_bands, n_target_frames).
     """
-    n_bands = intensity_matrix.shape[0]
-    n_target = len(target_frame_times)
-    fill = 1.0 if mode == "mix" else 0.0
-    result = np.zeros((n_bands, n_target), dtype=np.float64)
-
-    for b in range(n_bands):
-        interp_fn = interp1d(
-            analysis_frame_times,
-            intensity_matrix[b, :],
-            kind='linear',
-            bounds_error=False,
-            fill_value=fill,
-        )
-        result[b, :] = interp_fn(target_frame_times)
+    fill = np.float32(1.0 if mode == "mix" else 0.0)
+    x = analysis_frame_times
+    intensity = np.asarray(intensity_matrix, dtype=np.float32)
+    if len(x) < 2:
+        return np.full((intensity.shape[0], len(target_frame_times)), fill, dtype=np.float32)
+
+    # All bands share the same time axis: locate each target frame's segment
+    # once, then blend the two neighbouring columns for every band at once
+    idx = np.clip(np.searchsorted(x, target_frame_times) - 1, 0, len(x) - 2)
+    x0 = x[idx]
+    t = ((target_frame_times - x0) / (x[idx + 1] - x0)).astype(np.float32)
+    y0 = intensity[:, idx]
+    result = y0 + t * (intensity[:, idx + 1] - y0)
+
+    outside = (target_frame_times < x[0]) | (target_frame_times > x[-1])
+    result[:, outside] = fill
 
     if mode == "mix":
-        return np.clip(result, 1.0, None)  # gain ratios >= 1.0
-    return np.clip(result, 0.0, 1.0)
+        return np.maximum(result, 1.0, out=result)  # gain ratios >= 1.0
+    return np.clip(result, 0.0, 1.0, out=result)
 
 
 # ---------------------------------------------------------------------------
@@ -102,68 +117,95 @@ def _compute_gain_matrix(
     # --- Vocal mode (unchanged) ---
     eq_factor = eq_level * 0.25  # 0 to 2.5 linear gain offset
 
-    gain = np.ones_like(intensity_matrix, dtype=np.float32)
-    for b, bdef in enumerate(band_defs):
-        center = bdef.center_hz
-        # Frequency-dependent scaling: more boost in vocal range
-        if 200 <= center <= 4000:
-            freq_scale = 1.2
-        elif 100 <= center <= 6000:
-            freq_scale = 1.0
-        else:
-            freq_scale = 0.7
-
-        gain[b, :] = 1.0 + eq_factor * freq_scale * intensity_matrix[b, :]
+    # Frequency-dependent scaling: more boost in vocal range
+    centers = np.array([bdef.center_hz for bdef in band_defs])
+    freq_scale = np.select(
+        [(centers >= 200) & (centers <= 4000), (centers >= 100) & (centers <= 6000)],
+        [1.2, 1.0],
+        default=0.7,
+    ).astype(np.float32)
 
+    gain = (np.float32(eq_factor) * freq_scale)[:, np.newaxis] * intensity_matrix
+    gain += 1.0
     return gain
 
 
 # ---------------------------------------------------------------------------
-# Stereo widening (kept from previous version)
+# Stereo widening
 # ---------------------------------------------------------------------------
 
-def apply_stereo_widen(audio: np.ndarray, amount: float = 1.3) -> np.ndarray:
-    """Widen stereo image using mid/side processing."""
-    if audio.ndim != 2 or audio.shape[1] != 2:
-        return audio
-
-    mid = (audio[:, 0] + audio[:, 1]) / 2
-    side = (audio[:, 0] - audio[:, 1]) / 2
-    side *= amount
+@njit(parallel=True, fastmath=True, cache=True)
+def _widen_blend(
+    audio: np.ndarray, widen_intensity: np.ndarray, hop: int, amount: float
+) -> None:
+    """
+    Mid/side stereo widening blended by a per-frame curve, in place.
 
-    result = np.empty_like(audio)
-    result[:, 0] = mid + side
-    result[:, 1] = mid - side
-    return result
+    For channel-first (2, n_samples) audio, each sample is mixed between dry
+    and widened (side scaled by amount) by the widen curve, linearly
+    interpolated between frames hop samples apart and held after the last
+    frame. Mid/side, the sample-level curve and the blend are computed on the
+    fly, so the audio is read and written exactly once.
+    """
+    last = len(widen_intensity) - 1
+    for i in prange(audio.shape[1]):
+        f = i // hop
+        if f >= last:
+            c = widen_intensity[last]
+        else:
+            t = (i - f * hop) / hop
+            c = widen_intensity[f] + (widen_intensity[f + 1] - widen_intensity[f]) * t
+        left = audio[0, i]
+        right = audio[1, i]
+        mid = (left + right) * 0.5
+        side = (left - right) * 0.5 * amount
+        audio[0, i] = left * (1.0 - c) + (mid + side) * c
+        audio[1, i] = right * (1.0 - c) + (mid - side) * c
 
 
 # ---------------------------------------------------------------------------
 # Normalization (simplified: no tanh limiter)
 # ---------------------------------------------------------------------------
 
+@njit(parallel=True, fastmath=True, cache=True)
+def _rms_and_peak(audio: np.ndarray) -> tuple[float, float]:
+    """RMS and peak magnitude over all channels of (n_channels, n_samples) audio, in one pass."""
+    sumsq = 0.0
+    peak = 0.0
+    n_channels, n_samples = audio.shape
+    for i in prange(n_samples):
+        for c in range(n_channels):
+            v = np.float64(audio[c, i])
+            sumsq += v * v
+            peak = max(peak, abs(v))
+    return np.sqrt(sumsq / max(n_channels * n_samples, 1)), peak
+
+
 def apply_normalization(audio: np.ndarray, mode: str, sample_rate: int) -> np.ndarray:
-    """Apply peak or loudness normalization. No limiter distortion."""
-    if mode == "none":
+    """
+    Apply peak or loudness normalization. No limiter distortion.
+
+    audio is channel-first (n_channels, n_samples). One fused RMS/peak
+    reduction, then a single in-place multiply (audio is modified and returned).
+    """
+    if mode not in ("peak", "loudness"):
         return audio
 
+    with kernel_lock():
+        rms, peak = _rms_and_peak(audio)
+
     if mode == "peak":
-        peak = np.max(np.abs(audio))
         if peak > 0:
-            return audio * (0.95 / peak)
+            np.multiply(audio, np.float32(0.95 / peak), out=audio)
         return audio
 
-    if mode == "loudness":
-        rms = np.sqrt(np.mean(audio ** 2))
-        if rms > 0:
-            target_rms = 10 ** (-16 / 20)
-            gain = target_rms / rms
-            result = audio * gain
-            # Safety clip guard (just scale down, no distortion)
-            peak = np.max(np.abs(result))
-            if peak > 0.95:
-                result *= 0.95 / peak
-            return result
-
+    if rms > 0:
+        target_rms = 10 ** (-16 / 20)
+        gain = target_rms / rms
+        # Safety clip guard (just scale down, no distortion)
+        if peak * gain > 0.95:
+            gain = 0.95 / peak
+        np.multiply(audio, np.float32(gain), out=audio)
     return audio
 
 
@@ -174,50 +216,161 @@ def apply_normalization(audio: np.ndarray, mode: str, sample_rate: int) -> np.nd
 # STFT parameters — use 2048 (same as analysis) to save memory
 PROC_N_FFT = 2048
 PROC_HOP = 512
+PROC_BLOCK = 1024  # frames per FFT batch
 
+_PROC_WINDOW = hann_window(PROC_N_FFT)
 
-def process_audio(
-    instrumental_path: str,
-    output_path: str,
+# The whole STFT → gain → ISTFT path relies on pocketfft keeping single
+# precision (float32 frames → complex64 bins → float32 samples).
+# PROC_N_FFT is a power of two, already a fast length for pocketfft.
+assert scipy.fft.rfft(np.zeros(PROC_N_FFT, dtype=np.float32)).dtype == np.complex64
+assert scipy.fft.next_fast_len(PROC_N_FFT, real=True) == PROC_N_FFT
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _apply_band_gain(S: np.ndarray, gain_matrix: np.ndarray, band_bounds: np.ndarray) -> None:
+    """
+    Multiply the (n_channels, n_frames, n_bins) STFT in place by each bin's
+    band gain.
+
+    Band b covers the contiguous bins band_bounds[b] to band_bounds[b + 1], so
+    each band's gain is broadcast over a contiguous run of bins instead of
+    expanding gain_matrix to a full (n_bins, n_frames) matrix. Bins outside
+    every band, and frames past the end of gain_matrix, keep unity gain.
+    """
+    n_channels = S.shape[0]
+    n_frames = min(S.shape[1], gain_matrix.shape[1])
+    n_bands = len(band_bounds) - 1
+    for f in prange(n_frames):
+        for b in range(n_bands):
+            g = gain_matrix[b, f]
+            for c in range(n_channels):
+                for k in range(band_bounds[b], band_bounds[b + 1]):
+                    S[c, f, k] *= g
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _soft_clip(audio: np.ndarray, ceiling: np.float32) -> None:
+    """
+    Clip guard, in place, in one pass over (n_channels, n_samples) audio:
+    samples whose magnitude exceeds the ceiling are bent smoothly towards 1.0
+    with tanh; the rest are untouched.
+    """
+    knee = np.float32(1.0) - ceiling
+    inv_knee = np.float32(1.0) / knee
+    n_channels, n_samples = audio.shape
+    for i in prange(n_samples):
+        for c in range(n_channels):
+            v = audio[c, i]
+            a = abs(v)
+            if a > ceiling:
+                y = ceiling + knee * np.tanh((a - ceiling) * inv_knee)
+                audio[c, i] = y if v > 0 else -y
+
+
+def _map_channels(fn, n_channels: int) -> None:
+    """
+    Run fn(c) for every channel, on one thread per channel when there are
+    several: the FFTs and numpy array ops inside release the GIL. The Numba
+    kernels stay outside, since they are already parallel.
+    """
+    if n_channels == 1:
+        fn(0)
+        return
+    with ThreadPoolExecutor(max_workers=n_channels) as pool:
+        list(pool.map(fn, range(n_channels)))
+
+
+def _stft(channels: np.ndarray) -> np.ndarray:
+    """
+    complex64 STFT of every channel: (n_channels, n_samples) in,
+    frame-major (n_channels, n_frames, PROC_N_FFT//2+1) out.
+
+    Framed and transformed like the analysis STFT (analyzer.stft_frames and
+    rfft_blocks), PROC_BLOCK frames per batch, channels concurrently.
+    """
+    n_channels = len(channels)
+    frames = stft_frames(channels, PROC_N_FFT, PROC_HOP)
+    n_frames = frames.shape[1]
+    S = np.empty((n_channels, n_frames, PROC_N_FFT // 2 + 1), dtype=np.complex64)
+    workers = max(1, (os.cpu_count() or 1) // n_channels)
+
+    def stft_channel(c: int) -> None:
+        for start, block in rfft_blocks(frames[c], _PROC_WINDOW, PROC_BLOCK, workers):
+            S[c, start:start + len(block)] = block
+
+    _map_channels(stft_channel, n_channels)
+    return S
+
+
+def _istft(S: np.ndarray, length: int) -> np.ndarray:
+    """
+    Inverse of _stft: windowed overlap-add normalized by the window
+    sum-square (as librosa.istft), trimmed to the original signal length.
+    Returns (n_channels, length) float32. S is used as FFT scratch space and
+    must not be reused afterwards.
+
+    PROC_HOP divides PROC_N_FFT, so each frame is added as PROC_N_FFT//PROC_HOP
+    hop-sized chunks onto a (n_chunks, PROC_HOP) view of the output.
+    """
+    n_channels, n_frames = S.shape[:2]
+    n_sub = PROC_N_FFT // PROC_HOP
+    out = np.zeros((n_channels, n_frames + n_sub - 1, PROC_HOP), dtype=np.float32)
+    workers = max(1, (os.cpu_count() or 1) // n_channels)
+
+    # Window sum-square envelope of the same frame layout
+    win_sq = (_PROC_WINDOW ** 2).reshape(n_sub, PROC_HOP)
+    wss = np.zeros(out.shape[1:], dtype=np.float32)
+    for j in range(n_sub):
+        wss[j:j + n_frames] += win_sq[j]
+    nonzero = wss > np.finfo(np.float32).tiny
+
+    def istft_channel(c: int) -> None:
+        for start in range(0, n_frames, PROC_BLOCK):
+            block = scipy.fft.irfft(
+                S[c, start:start + PROC_BLOCK], n=PROC_N_FFT, axis=-1,
+                workers=workers, overwrite_x=True,
+            )
+            block *= _PROC_WINDOW
+            block = block.reshape(len(block), n_sub, PROC_HOP)
+            for j in range(n_sub):
+                out[c, start + j:start + j + len(block)] += block[:, j]
+        out[c][nonzero] /= wss[nonzero]
+
+    _map_channels(istft_channel, n_channels)
+
+    y = out.reshape(n_channels, -1)[:, PROC_N_FFT // 2:PROC_N_FFT // 2 + length]
+    if y.shape[1] < length:
+        y = np.pad(y, ((0, 0), (0, length - y.shape[1])))
+    return y
+
+
+def _apply_spectral_gain(
+    audio: np.ndarray,
+    sr: int,
     intensity_matrix: np.ndarray,
     analysis_frame_times: np.ndarray,
     band_defs: list[BandDefinition],
     eq_level: int,
-    mode: str = "vocal",
-    stereo_widen: bool = False,
-    normalization: str = "none",
+    mode: str,
+    stereo_widen: bool,
     progress_callback=None,
-) -> None:
+) -> np.ndarray:
     """
-    Process the instrumental track with multiband STFT spectral gain.
-
-    Each frequency band is independently boosted based on how much
-    vocal energy was detected in that band. Processing is done in the
-    STFT domain for clean, artifact-free results.
-
-    Memory-optimized: uses float32, processes in-place, frees intermediates.
+    STFT → per-band gain → ISTFT of channel-first audio, plus the optional
+    stereo widening driven by the same gains. Returns the new audio buffer.
     """
-    # Load audio as float32 to save memory
-    audio, sr = sf.read(instrumental_path, dtype='float32')
-    total_samples = audio.shape[0]
-    is_stereo = audio.ndim == 2
-
-    if progress_callback:
-        progress_callback(5)
-
+    n_channels, total_samples = audio.shape
     n_bands = len(band_defs)
 
     # Compute band mapping for THIS sample rate (may differ from analysis SR)
     band_edges = compute_band_edges(n_bands, sr)
-    bin_groups = map_bins_to_bands(PROC_N_FFT, sr, band_edges)
-
-    # Compute STFT frame times for the instrumental
-    n_stft_frames = 1 + (total_samples - PROC_N_FFT) // PROC_HOP
-    if n_stft_frames <= 0:
-        n_stft_frames = 1
-    stft_frame_times = librosa.frames_to_time(
-        np.arange(n_stft_frames), sr=sr, hop_length=PROC_HOP
-    )
+    band_bounds = map_bins_to_band_bounds(PROC_N_FFT, sr, band_edges)
+
+    # STFT frame times for the instrumental: the centered STFT yields exactly
+    # 1 + total_samples // hop frames, so the gain matrix covers all of them
+    n_stft_frames = 1 + total_samples // PROC_HOP
+    stft_frame_times = np.arange(n_stft_frames, dtype=np.float32) * np.float32(PROC_HOP / sr)
 
     if progress_callback:
         progress_callback(10)
@@ -225,103 +378,117 @@ def process_audio(
     # Interpolate analysis intensity to instrumental STFT frame rate (float32)
     interp_intensity = _interpolate_intensity_to_stft_frames(
         intensity_matrix, analysis_frame_times, stft_frame_times, mode=mode
-    ).astype(np.float32)
-
-    # Free analysis matrix early
-    del intensity_matrix
+    )
 
     # Compute per-band gain matrix
     gain_matrix = _compute_gain_matrix(interp_intensity, eq_level, band_defs, mode=mode)
     del interp_intensity  # free after gain computation
 
-    if progress_callback:
-        progress_callback(15)
-
-    # Expand gain_matrix from bands to individual STFT bins (float32)
-    n_bins = PROC_N_FFT // 2 + 1
-    bin_gain = np.ones((n_bins, len(stft_frame_times)), dtype=np.float32)
-    for b, bins in enumerate(bin_groups):
-        if len(bins) > 0:
-            bin_gain[bins, :] = gain_matrix[b, :]
-    del gain_matrix  # free
-
     if progress_callback:
         progress_callback(20)
 
-    # Process each channel through STFT → gain → ISTFT
+    # All channels through STFT → gain → ISTFT together
     # Memory-efficient: multiply gain directly into STFT, avoid extra copies
-    def process_channel(signal: np.ndarray) -> np.ndarray:
-        S = librosa.stft(signal, n_fft=PROC_N_FFT, hop_length=PROC_HOP)
-        n_actual_frames = S.shape[1]
-        n_precomp_frames = bin_gain.shape[1]
+    S = _stft(audio)
+    # Apply gain directly to the complex STFT (magnitude × gain, phase preserved)
+    # |S| * gain * e^(j*phase) = S * gain  (since S = |S| * e^(j*phase))
+    with kernel_lock():
+        _apply_band_gain(S, gain_matrix, band_bounds)
+    if progress_callback:
+        progress_callback(45)
 
-        if n_actual_frames <= n_precomp_frames:
-            bg = bin_gain[:, :n_actual_frames]
-        else:
-            pad_width = n_actual_frames - n_precomp_frames
-            bg = np.pad(bin_gain, ((0, 0), (0, pad_width)),
-                        mode='constant', constant_values=1.0)
-
-        # Apply gain directly to the complex STFT (magnitude × gain, phase preserved)
-        # |S| * gain * e^(j*phase) = S * gain  (since S = |S| * e^(j*phase))
-        S *= bg
-        result = librosa.istft(S, hop_length=PROC_HOP, length=len(signal))
-        del S  # free STFT immediately
-        return result
-
-    if is_stereo:
-        left = process_channel(audio[:, 0].copy())
-        audio[:, 0] = left
-        del left
-        if progress_callback:
-            progress_callback(45)
-        right = process_channel(audio[:, 1].copy())
-        audio[:, 1] = right
-        del right
-        if progress_callback:
-            progress_callback(70)
-    else:
-        audio = process_channel(audio)
-        if progress_callback:
-            progress_callback(70)
+    audio = _istft(S, total_samples)
+    del S  # free STFT immediately
+    if progress_callback:
+        progress_callback(70)
 
     # Optional stereo widening (modulated by max intensity across bands)
-    if stereo_widen and is_stereo:
-        # Recompute a lightweight widen curve from bin_gain
-        # Max gain across all bins per frame → where processing is active
-        max_gain_per_frame = np.max(bin_gain, axis=0)
+    if stereo_widen and n_channels == 2:
+        # Lightweight widen curve from the band gains
+        # Max gain per frame over the bands that own STFT bins → where
+        # processing is active. Bins outside every band (DC at least) keep
+        # unity gain, hence the 1.0 floor.
+        active = band_bounds[1:] > band_bounds[:-1]
+        max_gain_per_frame = np.max(gain_matrix[active], axis=0, initial=1.0)
         # Normalize: gain=1 means no activity, above 1 means activity
         widen_intensity = np.clip((max_gain_per_frame - 1.0) /
-                                  (max_gain_per_frame.max() - 1.0 + 1e-8), 0, 1)
-        # Interpolate to sample level
-        widen_sample = np.interp(
-            np.arange(total_samples) / sr,
-            stft_frame_times[:len(widen_intensity)],
-            widen_intensity
-        ).astype(np.float32)
-        del widen_intensity, max_gain_per_frame
-
-        wet = apply_stereo_widen(audio, 1.3)
-        c = widen_sample[:, np.newaxis]
-        audio = audio * (1.0 - c) + wet * c
-        del wet, c, widen_sample
-
-    del bin_gain  # free the last large array
+                                  (max_gain_per_frame.max() - 1.0 + 1e-8), 0, 1).astype(np.float32)
+        del max_gain_per_frame
+
+        with kernel_lock():
+            _widen_blend(audio, widen_intensity, PROC_HOP, 1.3)
+        del widen_intensity
+
+    del gain_matrix
+
+    return audio
+
+
+def process_audio(
+    instrumental_path: str,
+    output_path: str,
+    intensity_matrix: np.ndarray,
+    analysis_frame_times: np.ndarray,
+    band_defs: list[BandDefinition],
+    eq_level: int,
+    mode: str = "vocal",
+    stereo_widen: bool = False,
+    normalization: str = "none",
+    progress_callback=None,
+) -> None:
+    """
+    Process the instrumental track with multiband STFT spectral gain.
+
+    Each frequency band is independently boosted based on how much
+    vocal energy was detected in that band. Processing is done in the
+    STFT domain for clean, artifact-free results.
+
+    Memory-optimized: uses float32, processes in-place, frees intermediates.
+    intensity_matrix is never written to. With eq_level 0 the STFT is
+    skipped, and the input file is copied when no other pass applies.
+    """
+    # Load audio as float32 to save memory. Everything below works
+    # channel-first, (n_channels, n_samples): the transposed view costs
+    # nothing, the STFT padding copy lays each channel out as a contiguous
+    # row, and the ISTFT returns contiguous rows for the in-place passes.
+    audio, sr = sf.read(instrumental_path, dtype='float32', always_2d=True)
+    audio = audio.T
+
+    if progress_callback:
+        progress_callback(5)
+
+    ceiling = np.float32(0.98)
+    if eq_level == 0:
+        # Unity gain everywhere: the STFT round trip, and the widen blend whose
+        # curve follows the gains, would leave the audio unchanged. If nothing
+        # else would touch it either, hand back the original file as is.
+        same_format = (
+            os.path.splitext(output_path)[1].lower()
+            == os.path.splitext(instrumental_path)[1].lower()
+        )
+        unchanged = normalization == "none" and same_format
+        if unchanged:
+            with kernel_lock():
+                unchanged = _rms_and_peak(audio)[1] <= ceiling
+        if unchanged:
+            shutil.copyfile(instrumental_path, output_path)
+            if progress_callback:
+                progress_callback(100)
+            return
+    else:
+        audio = _apply_spectral_gain(
+            audio, sr, intensity_matrix, analysis_frame_times, band_defs,
+            eq_level, mode, stereo_widen, progress_callback,
+        )
+    del intensity_matrix
 
     if progress_callback:
         progress_callback(80)
 
     # Per-sample clip guard: only reduce samples that exceed the ceiling.
     # This preserves untouched regions at their original level.
-    ceiling = np.float32(0.98)
-    over_mask = np.abs(audio) > ceiling
-    if np.any(over_mask):
-        audio[over_mask] = np.sign(audio[over_mask]) * (
-            ceiling + (1.0 - ceiling) * np.tanh(
-                (np.abs(audio[over_mask]) - ceiling) / (1.0 - ceiling)
-            )
-        )
-    del over_mask
+    with kernel_lock():
+        _soft_clip(audio, ceiling)
 
     # Normalization (applies only if user selected peak or loudness)
     audio = apply_normalization(audio, normalization, sr)
@@ -329,32 +496,90 @@ def process_audio(
     if progress_callback:
         progress_callback(90)
 
-    # Write output as WAV first (lossless intermediate)
-    wav_output = output_path
-    if not output_path.lower().endswith('.wav'):
-        wav_output = output_path + '.tmp.wav'
-
-    sf.write(wav_output, audio, sr, subtype='FLOAT')
-
-    if progress_callback:
-        progress_callback(95)
-
-    # Convert to target format using ffmpeg if needed
-    if wav_output != output_path:
+    # WAV is written directly; other formats are encoded by ffmpeg from raw
+    # float32 PCM piped to its stdin (no intermediate file)
+    if output_path.lower().endswith('.wav'):
+        sf.write(output_path, audio.T, sr, subtype='FLOAT')
+    else:
         ext = os.path.splitext(output_path)[1].lower()
         codec_args = get_output_codec_args(ext, instrumental_path)
-        cmd = [
-            'ffmpeg', '-y', '-i', wav_output,
-            *codec_args,
-            output_path,
-        ]
-        subprocess.run(cmd, capture_output=True, check=True)
-        os.remove(wav_output)
+        _encode_ffmpeg(audio, sr, output_path, codec_args)
 
     if progress_callback:
         progress_callback(100)
 
 
+PIPE_CHUNK = 1 << 18  # samples per channel written to ffmpeg at a time
+
+
+def _encode_ffmpeg(
+    audio: np.ndarray, sr: int, output_path: str, codec_args: list[str]
+) -> None:
+    """
+    Encode channel-first float32 audio to output_path by piping interleaved
+    f32le PCM into ffmpeg's stdin, PIPE_CHUNK samples at a time, so encoding
+    overlaps with the interleaving and nothing is written to disk first.
+    """
+    n_channels, n_samples = audio.shape
+    cmd = [
+        'ffmpeg', '-y', '-nostats', '-v', 'error',
+        '-f', 'f32le', '-ar', str(sr), '-ac', str(n_channels), '-i', '-',
+        *codec_args,
+        output_path,
+    ]
+    with subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        # Drain stderr alongside the writes, so a chatty ffmpeg can't fill the
+        # pipe and block them
+        stderr_parts = []
+        reader = threading.Thread(target=lambda: stderr_parts.append(proc.stderr.read()))
+        reader.start()
+        try:
+            for start in range(0, n_samples, PIPE_CHUNK):
+                chunk = np.ascontiguousarray(audio[:, start:start + PIPE_CHUNK].T, dtype='<f4')
+                proc.stdin.write(memoryview(chunk))
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; its error is reported below
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            reader.join()
+        proc.wait()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=b"".join(stderr_parts))
+
+
+def warmup_kernels() -> None:
+    """
+    Compile (or load from the on-disk cache) the processing Numba kernels
+    with the argument types process_audio uses, by running a tiny stereo
+    buffer through it, so the first processed file doesn't pay the JIT cost.
+    """
+    band_defs = build_band_definitions(compute_band_edges(6, 22050))
+    frame_times = np.arange(4) * PROC_HOP / 22050
+    gain_ratios = np.full((6, 4), 2.0, dtype=np.float32)
+    ceiling = np.float32(0.98)
+
+    # Channel-first view of an interleaved buffer, as loaded by sf.read
+    audio = np.zeros((PROC_N_FFT, 2), dtype=np.float32).T
+    _soft_clip(audio, ceiling)  # eq_level 0 path
+    _rms_and_peak(audio)
+    audio = _apply_spectral_gain(
+        audio, 44100, gain_ratios, frame_times, band_defs, 5, "mix", True,
+    )
+    _soft_clip(audio, ceiling)
+    _rms_and_peak(audio)
+
+    # Mono buffers are contiguous either way
+    mono = np.zeros((1, PROC_N_FFT), dtype=np.float32)
+    _soft_clip(mono, ceiling)
+    _rms_and_peak(mono)
+
+
 async def process_audio_async(
     instrumental_path: str,
     output_path: str,
@@ -367,32 +592,23 @@ async def process_audio_async(
     normalization: str = "none",
     progress_callback=None,
 ) -> None:
-    """Async wrapper for process_audio with WebSocket progress support."""
-    last_pct = [0]
-
-    def sync_progress(pct: int):
-        last_pct[0] = pct
+    """
+    Async wrapper for process_audio: runs it in the default executor.
 
-    loop = asyncio.get_event_loop()
+    progress_callback(pct) is called synchronously from the worker thread, so
+    it must be cheap and thread-safe (e.g. storing the latest value).
+    """
+    loop = asyncio.get_running_loop()
 
-    task = loop.run_in_executor(
+    await loop.run_in_executor(
         None,
         lambda: process_audio(
             instrumental_path, output_path,
             intensity_matrix, analysis_frame_times, band_defs,
             eq_level, mode, stereo_widen, normalization,
-            progress_callback=sync_progress,
+            progress_callback=progress_callback,
         )
     )
 
-    # Poll progress while processing runs
-    while not task.done():
-        if progress_callback and last_pct[0] > 0:
-            await progress_callback(last_pct[0])
-        await asyncio.sleep(0.3)
-
-    # Await to propagate exceptions
-    await task
-
     if progress_callback:
-        await progress_callback(100)
+        progress_callback(100)
@@ -1,9 +1,12 @@
+import functools
 import os
 import re
 import shutil
 import subprocess
 import json
 
+import numpy as np
+
 UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "..", "uploads"))
 
 _SESSION_ID_RE = re.compile(r"^[a-f0-9]{12}$")
@@ -46,12 +49,28 @@ def check_dependencies():
         raise RuntimeError("ffprobe not found in PATH")
 
 
-def get_audio_duration(filepath: str) -> float:
+def get_audio_info(filepath: str) -> dict:
+    """
+    Duration (seconds) and first audio stream bit rate (bits/s), from a single
+    ffprobe call. Cached per file version (path, size, mtime), so repeated
+    lookups on the same upload or output don't spawn ffprobe again.
+    Missing values are None.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError as e:
+        raise RuntimeError(f"ffprobe failed for {filepath}: {e}") from e
+    return _probe_audio(filepath, st.st_size, st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _probe_audio(filepath: str, size: int, mtime_ns: int) -> dict:
     result = subprocess.run(
         [
             "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
+            "-select_streams", "a:0",
+            "-show_entries", "format=duration:stream=bit_rate",
+            "-of", "json",
             filepath,
         ],
         capture_output=True, text=True,
@@ -59,27 +78,37 @@ def get_audio_duration(filepath: str) -> float:
     if result.returncode != 0:
         raise RuntimeError(f"ffprobe failed for {filepath}: {result.stderr}")
     try:
-        return float(result.stdout.strip())
-    except ValueError:
-        raise RuntimeError(f"Invalid duration from ffprobe: {result.stdout}")
+        data = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        raise RuntimeError(f"Invalid ffprobe output: {result.stdout}")
 
+    streams = data.get("streams") or [{}]
+    return {
+        "duration": _parse_number(float, data.get("format", {}).get("duration")),
+        "bit_rate": _parse_number(int, streams[0].get("bit_rate")),
+    }
 
-def get_audio_bitrate(filepath: str) -> int:
-    result = subprocess.run(
-        [
-            "ffprobe", "-v", "error",
-            "-select_streams", "a:0",
-            "-show_entries", "stream=bit_rate",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            filepath,
-        ],
-        capture_output=True, text=True,
-    )
+
+def _parse_number(kind, value):
     try:
-        val = int(result.stdout.strip())
-        return val if val > 0 else 192000
+        return kind(value)
     except (ValueError, TypeError):
+        return None
+
+
+def get_audio_duration(filepath: str) -> float:
+    duration = get_audio_info(filepath)["duration"]
+    if duration is None:
+        raise RuntimeError(f"Invalid duration from ffprobe for {filepath}")
+    return duration
+
+
+def get_audio_bitrate(filepath: str) -> int:
+    try:
+        val = get_audio_info(filepath)["bit_rate"]
+    except RuntimeError:
         return 192000
+    return val if val and val > 0 else 192000
 
 
 def get_output_codec_args(ext: str, input_file: str) -> list[str]:
@@ -92,33 +121,35 @@ def get_output_codec_args(ext: str, input_file: str) -> list[str]:
     return ["-c:a", codec]
 
 
+PEAKS_SR = 8000  # decode rate for waveform peaks (display only)
+
+
 def get_waveform_peaks(filepath: str, num_peaks: int = 1000) -> list[float]:
-    """Extract waveform peaks for visualization using ffmpeg."""
-    duration = get_audio_duration(filepath)
-    samples_per_peak = max(1, int(duration * 44100 / num_peaks))
+    """
+    Extract waveform peaks for visualization using ffmpeg.
 
+    The file is decoded once to 16-bit mono PCM at PEAKS_SR and split into
+    num_peaks equal blocks; each peak is the block's max |sample| in 0-1.
+    """
     result = subprocess.run(
         [
-            "ffprobe", "-v", "error",
-            "-f", "lavfi",
-            "-i", f"amovie={filepath},asetnsamples={samples_per_peak},astats=metadata=1:reset=1",
-            "-show_entries", "frame_tags=lavfi.astats.Overall.Peak_level",
-            "-of", "json",
+            "ffmpeg", "-nostats", "-v", "error",
+            "-i", filepath,
+            "-f", "s16le", "-ac", "1", "-ar", str(PEAKS_SR),
+            "-",
         ],
-        capture_output=True, text=True,
+        capture_output=True,
     )
-
-    try:
-        data = json.loads(result.stdout)
-        peaks = []
-        for frame in data.get("frames", []):
-            tags = frame.get("tags", {})
-            level_str = tags.get("lavfi.astats.Overall.Peak_level", "-inf")
-            if level_str == "-inf":
-                peaks.append(0.0)
-            else:
-                db = float(level_str)
-                peaks.append(max(0.0, min(1.0, 10 ** (db / 20))))
-        return peaks
-    except (json.JSONDecodeError, ValueError):
+    pcm = np.frombuffer(result.stdout, dtype=np.int16)
+    if result.returncode != 0 or len(pcm) == 0:
         return [0.0] * num_peaks
+
+    # Equal blocks of at least one sample: trim the remainder, or zero-pad
+    # very short files up to one sample per peak
+    per_peak = max(1, len(pcm) // num_peaks)
+    pcm = pcm[:per_peak * num_peaks]
+    if len(pcm) < num_peaks:
+        pcm = np.pad(pcm, (0, num_peaks - len(pcm)))
+    # int32 so that |-32768| doesn't overflow
+    peaks = np.abs(pcm.reshape(num_peaks, per_peak).astype(np.int32)).max(axis=1)
+    return (peaks / 32768.0).tolist()